@@ -1,78 +1,166 @@
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.dataset
+import pyarrow.fs
+import pyarrow.parquet as pq
+import fsspec
+import fsspec.implementations.local
+import json
+import scipy.sparse
+import numba
+import fim
 import mlxtend.frequent_patterns
 import mlxtend.preprocessing
 import functools
-
-
-def read_vaers_csv(filename, dtype=None, parse_dates=False):
-    '''Read a VAERS CSV file into a dataframe with "VAERS_ID" as index.'''
-    return pd.read_csv(filename, encoding='iso-8859-1', dtype=dtype, parse_dates=parse_dates).set_index('VAERS_ID')
-
-
-def read_data_file(filename):
+import collections
+import itertools
+
+
+LABELED_ITEM_COLS = {
+    'DIED': 'Died',
+    'L_THREAT': 'Life-threatening illness',
+    'ER_VISIT': 'Emergency room visit',
+    'HOSPITAL': 'Hospitalized ',
+    'X_STAY': 'Prolongation of existing hospitalization',
+    'DISABLE': 'Disability',
+    'RECOVD': 'Recovered',
+    'BIRTH_DEFECT': 'Birth defect'
+}
+
+VALUE_ITEM_COLS = ['STATE', 'VAX_NAME', 'SYMPTOM1', 'SYMPTOM2', 'SYMPTOM3', 'SYMPTOM4', 'SYMPTOM5']
+
+# Boundaries between the age groups of convert_to_age_group, and the group labels.
+_AGE_BINS = np.array([3.0, 6.0, 14.0, 19.0, 34.0, 49.0, 65.0, 79.0])
+_AGE_LABELS = np.array(['Age 0-2', 'Age 3-5', 'Age 6-13', 'Age 14-18', 'Age 19-33',
+                        'Age 34-48', 'Age 49-64', 'Age 65-78', 'Age 79-older'], dtype=object)
+
+
+DATA_COLS = ['STATE', 'AGE_YRS', 'SEX', 'DIED', 'L_THREAT', 'ER_VISIT', 'HOSPITAL', 'X_STAY', 'DISABLE', 'RECOVD',
+             'BIRTH_DEFECT']
+SYMPTOM_COLS = ['SYMPTOM1', 'SYMPTOM2', 'SYMPTOM3', 'SYMPTOM4', 'SYMPTOM5']
+VAX_COLS = ['VAX_NAME']
+
+# pyarrow type of the 'category' dtype of read_vaers_csv; such columns are dictionary encoded as they are parsed.
+_CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+_CSV_BATCH_SIZE = 100_000
+
+
+def _arrow_type(col, dtype):
+    '''Convert a read_vaers_csv "dtype" value to the pyarrow type its column is parsed as.'''
+    if isinstance(dtype, str) and dtype == 'category':
+        return _CATEGORY_TYPE
+    if dtype in (object, str, 'object', 'str'):
+        return pa.string()
+    try:
+        return pa.from_numpy_dtype(np.dtype(dtype))
+    except (TypeError, pa.ArrowNotImplementedError):
+        raise ValueError(f'Unsupported dtype {dtype!r} for column \'{col}\'') from None
+
+
+def read_vaers_csv(filename, dtype=None, usecols=None):
+    '''Read a VAERS CSV file into a dataframe with "VAERS_ID" as index.
+
+    If "usecols" is given, only those columns (plus "VAERS_ID") are read. "dtype" maps column names
+    to 'category' or a NumPy dtype such as float or object; other columns are read as strings, since
+    pyarrow.dataset would otherwise infer their types from the first block of the file alone.
+    The file is scanned in batches with pyarrow.dataset, keeping only the wanted columns, with the
+    'category' ones dictionary encoded as they are parsed. The batches are collected into one table,
+    which is then converted to the dataframe.'''
+    fs, path = fsspec.core.url_to_fs(filename)
+    # Read local files through pyarrow's own filesystem; a parse error while reading through the fsspec
+    # wrapper can otherwise abort the interpreter at exit.
+    if isinstance(fs, fsspec.implementations.local.LocalFileSystem):
+        filesystem = pyarrow.fs.LocalFileSystem()
+    else:
+        filesystem = pyarrow.fs.PyFileSystem(pyarrow.fs.FSSpecHandler(fs))
+    read_options = pyarrow.csv.ReadOptions(encoding='iso-8859-1')
+    if usecols is None:
+        columns = pyarrow.dataset.dataset(
+            path, format=pyarrow.dataset.CsvFileFormat(read_options=read_options), filesystem=filesystem).schema.names
+    else:
+        columns = ['VAERS_ID', *usecols]
+    column_types = {col: pa.string() for col in columns}
+    column_types['VAERS_ID'] = pa.int64()
+    column_types.update({col: _arrow_type(col, t) for col, t in (dtype or {}).items() if col in column_types})
+
+    dataset = pyarrow.dataset.dataset(
+        path,
+        format=pyarrow.dataset.CsvFileFormat(
+            read_options=read_options,
+            convert_options=pyarrow.csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)),
+        filesystem=filesystem)
+    table = dataset.to_table(columns=columns, batch_size=_CSV_BATCH_SIZE).unify_dictionaries()
+    return table.to_pandas().set_index('VAERS_ID')
+
+
+def read_data_file(filename, usecols=None):
     '''Read a VAERSDATA file into a dataframe with "VAERS_ID" as index.'''
     return read_vaers_csv(
         filename,
+        usecols=usecols,
         dtype={
-            'STATE': str,
+            'STATE': 'category',
             'AGE_YRS': float,
             'CAGE_YR': float,
             'CAGE_MO': float,
-            'SEX': str,
-            'SYMPTOM_TEXT': str,
-            'DIED': str,
-            'L_THREAT': str,
-            'ER_VISIT': str,
-            'HOSPITAL': str,
+            'SEX': 'category',
+            'SYMPTOM_TEXT': object,
+            'DIED': 'category',
+            'L_THREAT': 'category',
+            'ER_VISIT': 'category',
+            'HOSPITAL': 'category',
             'HOSPDAYS': float,
-            'X_STAY': str,
-            'DISABLE': str,
-            'RECOVD': str,
+            'X_STAY': 'category',
+            'DISABLE': 'category',
+            'RECOVD': 'category',
             'NUMDAYS': float,
-            'LAB_DATA': str,
-            'V_ADMINBY': str,
-            'V_FUNDBY': str,
-            'OTHER_MEDS': str,
-            'CUR_ILL': str,
-            'HISTORY': str,
-            'PRIOR_VAX': str,
-            'SPLTTYPE': str,
+            'LAB_DATA': object,
+            'V_ADMINBY': object,
+            'V_FUNDBY': object,
+            'OTHER_MEDS': object,
+            'CUR_ILL': object,
+            'HISTORY': object,
+            'PRIOR_VAX': object,
+            'SPLTTYPE': object,
             'FORM_VERS': float,
-            'BIRTH_DEFECT': str,
-            'OFC_VISIT': str,
-            'ER_ED_VISIT': str,
-            'ALLERGIES': str
-        },
-        parse_dates=['RECVDATE', 'RPT_DATE', 'DATEDIED', 'VAX_DATE', 'ONSET_DATE', 'TODAYS_DATE'])
+            'BIRTH_DEFECT': 'category',
+            'OFC_VISIT': object,
+            'ER_ED_VISIT': object,
+            'ALLERGIES': object
+        })
 
 
-def read_symptoms_file(filename):
+def read_symptoms_file(filename, usecols=None):
     '''Read a VAERSSYMPTOMS file into a dataframe with "VAERS_ID" as index.'''
-    return read_vaers_csv(filename)
+    return read_vaers_csv(filename, usecols=usecols, dtype={col: 'category' for col in SYMPTOM_COLS})
 
 
-def read_vax_file(filename):
+def read_vax_file(filename, usecols=None):
     '''Read a VAERSVAX file into a dataframe with "VAERS_ID" as index.'''
-    return read_vaers_csv(filename)
+    return read_vaers_csv(filename, usecols=usecols, dtype={col: 'category' for col in VAX_COLS})
 
 
 def merge_dataframes(dataframes: list) -> pd.DataFrame:
-    '''Merge VAERS dataframes on the index ("VAERS_ID")'''
-    return functools.reduce(lambda x, y: pd.merge(x, y, left_index=True, right_index=True, sort=False), dataframes)
-
-def append_if_not_na(list: list, obj: object):
-    '''Append "obj" to "list" if "obj" is not NA'''
-    if not pd.isna(obj):
-        list.append(obj)
+    '''Merge VAERS dataframes on the index ("VAERS_ID")
 
+    Dataframes with unique indexes are aligned in a single concat. VAERSSYMPTOMS and VAERSVAX
+    can have several rows per "VAERS_ID", which concat cannot align, so those are merged pairwise.'''
+    if all(df.index.is_unique for df in dataframes):
+        return pd.concat(dataframes, axis=1, join='inner', copy=False)
+    # Index merges; merging on a "VAERS_ID" column is slower for these tables.
+    return functools.reduce(lambda x, y: pd.merge(x, y, left_index=True, right_index=True, sort=False, copy=False), dataframes)
 
 def convert_to_age_group(age: float) -> str:
     '''Convert an age into an age group.
 
-    The age groups are defined by https://www.ncbi.nlm.nih.gov/pmc/articles/PMC3825015/.'''
+    The age groups are defined by https://www.ncbi.nlm.nih.gov/pmc/articles/PMC3825015/.
+    An unknown (NA) age has no age group.'''
 
-    if age < 3.0:
+    if age != age:
+        return pd.NA
+    elif age < 3.0:
         return 'Age 0-2'
     elif age < 6.0:
         return 'Age 3-5'
@@ -106,7 +194,7 @@ def convert_to_sex_group(sex: str) -> str:
 def convert_to_labeled_item(data: str, label: str) -> str:
     '''Convert a VERES boolean data value to the given label if the value is "Y".'''
     
-    return label if not pd.isna(data) and data == 'Y' else pd.NA
+    return label if data is not pd.NA and data == 'Y' else pd.NA
 
 
 def build_basket(data_row: pd.Series) -> list:
@@ -126,27 +214,47 @@ def build_basket(data_row: pd.Series) -> list:
         values representing the data fields of interest
     '''
     
-    basket = list()
-
-    append_if_not_na(basket, data_row['STATE'])
-    append_if_not_na(basket, convert_to_age_group(data_row['AGE_YRS']))
-    append_if_not_na(basket, convert_to_sex_group(data_row['SEX']))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['DIED'], 'Died'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['L_THREAT'], 'Life-threatening illness'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['ER_VISIT'], 'Emergency room visit'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['HOSPITAL'], 'Hospitalized '))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['X_STAY'], 'Prolongation of existing hospitalization'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['DISABLE'], 'Disability'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['RECOVD'], 'Recovered'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['BIRTH_DEFECT'], 'Birth defect'))
-    append_if_not_na(basket, data_row['VAX_NAME'])
-    append_if_not_na(basket, data_row['SYMPTOM1'])
-    append_if_not_na(basket, data_row['SYMPTOM2'])
-    append_if_not_na(basket, data_row['SYMPTOM3'])
-    append_if_not_na(basket, data_row['SYMPTOM4'])
-    append_if_not_na(basket, data_row['SYMPTOM5'])
-
-    return basket
+    candidates = (
+        data_row['STATE'],
+        convert_to_age_group(data_row['AGE_YRS']),
+        convert_to_sex_group(data_row['SEX']),
+        convert_to_labeled_item(data_row['DIED'], 'Died'),
+        convert_to_labeled_item(data_row['L_THREAT'], 'Life-threatening illness'),
+        convert_to_labeled_item(data_row['ER_VISIT'], 'Emergency room visit'),
+        convert_to_labeled_item(data_row['HOSPITAL'], 'Hospitalized '),
+        convert_to_labeled_item(data_row['X_STAY'], 'Prolongation of existing hospitalization'),
+        convert_to_labeled_item(data_row['DISABLE'], 'Disability'),
+        convert_to_labeled_item(data_row['RECOVD'], 'Recovered'),
+        convert_to_labeled_item(data_row['BIRTH_DEFECT'], 'Birth defect'),
+        data_row['VAX_NAME'],
+        data_row['SYMPTOM1'],
+        data_row['SYMPTOM2'],
+        data_row['SYMPTOM3'],
+        data_row['SYMPTOM4'],
+        data_row['SYMPTOM5'])
+
+    # Same as "not pd.isna(x)" for the values here (str, None, NaN or pd.NA), without its dispatch overhead.
+    return [x for x in candidates if x is not None and x is not pd.NA and x == x]
+
+
+def build_baskets(merged_data: pd.DataFrame) -> list:
+    '''Build the list of baskets of merged VAERS data, one basket per row.
+    The baskets have the same items as build_basket, but are built from whole columns at a time.
+
+    Each field is first converted, in one vectorized pass, to an array of the item of each row
+    (None where the row has no item for the field); the baskets then just collect the items of each row.'''
+
+    age = merged_data['AGE_YRS'].to_numpy(dtype=float)
+    sex = merged_data['SEX']
+    fields = [
+        np.where(np.isnan(age), None, _AGE_LABELS[np.searchsorted(_AGE_BINS, age, side='right')]),
+        np.where((sex == 'F').to_numpy(), 'Female', np.where((sex == 'M').to_numpy(), 'Male', 'Unknown Sex')).tolist()
+    ]
+    fields += [np.where((merged_data[col] == 'Y').to_numpy(), label, None) for col, label in LABELED_ITEM_COLS.items()]
+    fields += [np.where(merged_data[col].notna().to_numpy(), merged_data[col].to_numpy(dtype=object), None)
+               for col in VALUE_ITEM_COLS]
+
+    return [[item for item in row if item is not None] for row in zip(*fields)]
 
 
 def build_one_hot_basket_dataset(baskets: list) -> pd.DataFrame:
@@ -158,6 +266,278 @@ def build_one_hot_basket_dataset(baskets: list) -> pd.DataFrame:
     return df
 
 
+def _build_csr(codes):
+    '''Build the CSR index arrays of a one-hot matrix from the item codes of each row (-1 for no item).
+    Each row of the result lists its distinct items in ascending order.
+
+    Plain NumPy rather than the Numba kernel of proj_code_pkg: the deployed function could not cache
+    the kernel, so every cold start would compile it, which takes longer than this whole function.'''
+    sorted_codes = np.sort(codes, axis=1)
+    keep = sorted_codes >= 0
+    keep[:, 1:] &= sorted_codes[:, 1:] != sorted_codes[:, :-1]
+    indptr = np.zeros(len(codes) + 1, dtype=np.int64)
+    np.cumsum(np.count_nonzero(keep, axis=1), out=indptr[1:])
+    return indptr, sorted_codes[keep]
+
+
+def build_one_hot_matrix(merged_data: pd.DataFrame) -> tuple:
+    '''
+    Build the one-hot basket matrix directly from merged VAERS data.
+    Produces the same items as build_basket followed by build_one_hot_basket_dataset,
+    but works on whole columns at a time instead of one row at a time.
+
+    Parameters
+    ----------
+    merged_data : Pandas DataFrame
+        merged VAERS data
+
+    Returns
+    -------
+    SciPy CSR matrix
+        boolean one-hot matrix with one row per row of "merged_data" and one column per item
+    NumPy array
+        the item of each column, in sorted order
+    '''
+
+    n_rows = len(merged_data)
+
+    # For each field: the field-local code of the item in each row (-1 where the row has no item for the field),
+    # and the labels of the field-local codes.
+    fields = []
+
+    age = merged_data['AGE_YRS'].to_numpy(dtype=float)
+    fields.append((np.where(np.isnan(age), -1, np.searchsorted(_AGE_BINS, age, side='right')), _AGE_LABELS))
+
+    # The comparisons and factorize work on the category codes of categorical columns.
+    sex = merged_data['SEX']
+    fields.append((np.where((sex == 'F').to_numpy(), 0, np.where((sex == 'M').to_numpy(), 1, 2)),
+                   ['Female', 'Male', 'Unknown Sex']))
+
+    for col, label in LABELED_ITEM_COLS.items():
+        fields.append((np.where((merged_data[col] == 'Y').to_numpy(), 0, -1), [label]))
+
+    for col in VALUE_ITEM_COLS:
+        fields.append(pd.factorize(merged_data[col]))
+
+    # Map the field-local codes into one global item id space. The fields share labels (e.g. the symptom
+    # columns), so the labels are factorized again to merge them into a single column per item.
+    offsets = np.cumsum([0] + [len(labels) for _, labels in fields[:-1]])
+    all_labels = np.concatenate([np.asarray(labels, dtype=object) for _, labels in fields])
+    global_codes, items = pd.factorize(all_labels, sort=True)
+
+    # The age, sex and labeled fields list all their labels, including those no row has; like
+    # TransactionEncoder, only the items that occur get a column.
+    occurs = np.zeros(len(items), dtype=bool)
+    for (field_codes, labels), offset in zip(fields, offsets):
+        field_counts = np.bincount(field_codes[field_codes >= 0], minlength=len(labels))
+        occurs[global_codes[offset:offset + len(labels)][field_counts > 0]] = True
+    global_codes = (np.cumsum(occurs) - 1)[global_codes]
+    items = items[occurs]
+
+    codes = np.empty((n_rows, len(fields)), dtype=np.int32)
+    for f, ((field_codes, _), offset) in enumerate(zip(fields, offsets)):
+        codes[:, f] = np.where(field_codes >= 0, global_codes[field_codes + offset], -1)
+    indptr, indices = _build_csr(codes)
+
+    one_hot = scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, indptr),
+        shape=(n_rows, len(items)))
+    return one_hot, items
+
+
+def build_one_hot_sparse(merged_data: pd.DataFrame) -> pd.DataFrame:
+    '''Build the sparse one-hot basket dataframe that the mlxtend frequent itemsets functions expect,
+    directly from merged VAERS data. See build_one_hot_matrix.'''
+
+    one_hot, items = build_one_hot_matrix(merged_data)
+    return pd.DataFrame.sparse.from_spmatrix(one_hot, columns=items)
+
+
+def write_one_hot_parquet(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, path: str):
+    '''Save a one-hot basket matrix and its items, as built by build_one_hot_matrix, to a parquet file.
+
+    Each row of the file holds the item ids of one basket; the items are kept in the file metadata.'''
+    # 64-bit offsets, so that more than 2**31 item ids in total do not overflow.
+    baskets = pa.LargeListArray.from_arrays(pa.array(one_hot.indptr.astype(np.int64, copy=False)), pa.array(one_hot.indices))
+    table = pa.table({'item_ids': baskets}).replace_schema_metadata({'items': json.dumps(list(items))})
+    with fsspec.open(path, 'wb') as file:
+        pq.write_table(table, file, compression='zstd')
+
+
+def read_one_hot_parquet(path: str) -> tuple:
+    '''Read a one-hot basket matrix and its items from a parquet file saved by write_one_hot_parquet.'''
+    with fsspec.open(path, 'rb') as file:
+        table = pq.read_table(file)
+    items = np.array(json.loads(table.schema.metadata[b'items']), dtype=object)
+    baskets = table.column('item_ids').combine_chunks()
+    indices = baskets.flatten().to_numpy()
+    indptr = baskets.offsets.to_numpy() - baskets.offsets[0].as_py()
+    one_hot = scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, indptr),
+        shape=(len(baskets), len(items)))
+    return one_hot, items
+
+
+def find_frequent_itemsets(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, min_support: float) -> pd.DataFrame:
+    '''
+    Find frequent itemsets in a one-hot basket matrix with the FP-growth implementation
+    of the fim library, which is much faster than the pure Python one of mlxtend.
+
+    Parameters
+    ----------
+    one_hot : SciPy CSR matrix
+        boolean one-hot basket matrix, as built by build_one_hot_matrix
+    items : NumPy array
+        the item of each column of "one_hot"
+    min_support : float
+        A float between 0 and 1 for minumum support of the itemsets returned.
+
+    Returns
+    -------
+    Pandas DataFrame
+        frequent itemsets with the "support" and "itemsets" columns of mlxtend.frequent_patterns.fpgrowth,
+        usable with mlxtend.frequent_patterns.association_rules
+    '''
+
+    if min_support <= 0.:
+        raise ValueError('`min_support` must be a positive number within the interval `(0, 1]`. Got %s.' % min_support)
+
+    n_rows = one_hot.shape[0]
+    if n_rows == 0:
+        return pd.DataFrame({'support': [], 'itemsets': []})
+    item_ids = one_hot.indices.tolist()
+    # Identical baskets are common, so they are passed once each with their number of occurrences.
+    transactions = collections.Counter(
+        tuple(item_ids[start:end]) for start, end in zip(one_hot.indptr[:-1].tolist(), one_hot.indptr[1:].tolist()))
+
+    # A negative support is an absolute count for fim; this keeps the same itemsets as mlxtend's support >= min_support.
+    results = fim.fpgrowth(transactions, target='s', supp=-int(np.ceil(min_support * n_rows)), zmin=1, report='a')
+    # fim leaves out the itemsets made only of items that every basket has (it does report them together
+    # with other items), so those are added here.
+    full_item_ids = np.flatnonzero(np.bincount(one_hot.indices, minlength=one_hot.shape[1]) == n_rows).tolist()
+    results += [(itemset, n_rows) for size in range(1, len(full_item_ids) + 1)
+                for itemset in itertools.combinations(full_item_ids, size)]
+
+    return pd.DataFrame({
+        'support': [count / n_rows for _, count in results],
+        'itemsets': [frozenset(items[i] for i in itemset) for itemset, _ in results]
+    })
+
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+
+# The deployed source directory is read-only and each instance starts with an empty /tmp, so the ECLAT
+# kernels cannot be cached and are compiled on the first ECLAT run of an instance (under a second). Unlike
+# the one-hot build, that pays off: NumPy versions make ECLAT about 10x slower at low supports.
+@numba.njit
+def _popcount(x):
+    '''Count the set bits of a 64-bit word.'''
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+@numba.njit
+def _build_bitmaps(rows, cols, n_items, n_words):
+    '''Build one bitmap per item, where bit j is set if row j contains the item.'''
+    bitmaps = np.zeros((n_items, n_words), dtype=np.uint64)
+    for k in range(len(rows)):
+        bitmaps[cols[k], rows[k] >> 6] |= np.uint64(1) << np.uint64(rows[k] & 63)
+    return bitmaps
+
+
+@numba.njit
+def _count_intersections(prefix, bitmaps):
+    '''Count the set bits of the AND of the "prefix" bitmap with each of "bitmaps", without storing the ANDs.'''
+    counts = np.zeros(bitmaps.shape[0], dtype=np.int64)
+    for i in range(bitmaps.shape[0]):
+        count = 0
+        for w in range(bitmaps.shape[1]):
+            count += _popcount(prefix[w] & bitmaps[i, w])
+        counts[i] = count
+    return counts
+
+
+def _eclat(prefix: tuple, bitmaps: np.ndarray, counts: np.ndarray, item_ids: np.ndarray, min_count: int, results: list):
+    '''Depth-first ECLAT: extend "prefix" with each item of "item_ids", whose bitmaps and counts include "prefix".'''
+    for i in range(len(item_ids)):
+        itemset = prefix + (item_ids[i],)
+        results.append((itemset, counts[i]))
+        if i + 1 < len(item_ids):
+            # Counting only reads the bitmaps; the ANDs are then stored for the frequent extensions alone.
+            ext_counts = _count_intersections(bitmaps[i], bitmaps[i + 1:])
+            frequent = np.flatnonzero(ext_counts >= min_count)
+            if len(frequent) > 0:
+                ext_bitmaps = bitmaps[i + 1:][frequent]
+                np.bitwise_and(ext_bitmaps, bitmaps[i], out=ext_bitmaps)
+                _eclat(itemset, ext_bitmaps, ext_counts[frequent], item_ids[i + 1:][frequent], min_count, results)
+
+
+def eclat_frequent_itemsets(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, min_support: float) -> pd.DataFrame:
+    '''
+    Find frequent itemsets in a one-hot basket matrix with ECLAT over item bitmaps.
+    The support of an itemset is the number of set bits of the AND of its item bitmaps,
+    which is fast to compute when there are a few hundred frequent items.
+
+    Parameters
+    ----------
+    one_hot : SciPy CSR matrix
+        boolean one-hot basket matrix, as built by build_one_hot_matrix
+    items : NumPy array
+        the item of each column of "one_hot"
+    min_support : float
+        A float between 0 and 1 for minumum support of the itemsets returned.
+
+    Returns
+    -------
+    Pandas DataFrame
+        frequent itemsets with the "support" and "itemsets" columns of mlxtend.frequent_patterns.fpgrowth,
+        usable with mlxtend.frequent_patterns.association_rules
+    '''
+
+    if min_support <= 0.:
+        raise ValueError('`min_support` must be a positive number within the interval `(0, 1]`. Got %s.' % min_support)
+
+    n_rows = one_hot.shape[0]
+    if n_rows == 0:
+        return pd.DataFrame({'support': [], 'itemsets': []})
+    one_hot = one_hot.tocoo()
+    min_count = int(np.ceil(min_support * n_rows))
+
+    # Only frequent items can be in frequent itemsets. Least frequent items first keeps the intersections small.
+    item_counts = np.bincount(one_hot.col, minlength=one_hot.shape[1])
+    item_ids = np.flatnonzero(item_counts >= min_count)
+    item_ids = item_ids[np.argsort(item_counts[item_ids], kind='stable')]
+    bitmap_index = np.full(one_hot.shape[1], -1, dtype=np.int64)
+    bitmap_index[item_ids] = np.arange(len(item_ids))
+
+    keep = bitmap_index[one_hot.col] >= 0
+    bitmaps = _build_bitmaps(
+        one_hot.row[keep].astype(np.int64), bitmap_index[one_hot.col[keep]], len(item_ids), (n_rows + 63) // 64)
+
+    results = []
+    _eclat((), bitmaps, item_counts[item_ids], item_ids, min_count, results)
+
+    return pd.DataFrame({
+        'support': [count / n_rows for _, count in results],
+        'itemsets': [frozenset(items[i] for i in itemset) for itemset, _ in results]
+    })
+
+
+def write_csv(df: pd.DataFrame, path: str):
+    '''Write a dataframe, without its index, to a CSV file with the pyarrow CSV writer.
+    Object columns, such as the frozensets of itemsets, are written as their string representation.'''
+
+    df = df.assign(**{col: df[col].astype(str) for col in df.columns if df[col].dtype == object})
+    with fsspec.open(path, 'wb') as file:
+        pyarrow.csv.write_csv(pa.Table.from_pandas(df, preserve_index=False), file)
+
+
 def main(
     data_path='gs://input-data-2zu7/2021VAERSDATA.csv',
     symptoms_path='gs://input-data-2zu7/2021VAERSSYMPTOMS.csv',
@@ -166,12 +546,14 @@ def main(
     assoc_rules_output_path='gs://output-data-2zu7/assoc_rules.csv',
     freq_itemsets_min_support=0.001,
     assoc_rule_metric="confidence",
-    assoc_rule_min_threshold=0.8):
+    assoc_rule_min_threshold=0.8,
+    freq_itemsets_algorithm='fpgrowth',
+    one_hot_cache_path=None):
     '''
     Using the given input VAERS data files, produce in the outpu_path CSV files
     containing frequen itemsets and association rules using the given parameters.
 
-    This function makes use of the mlxtend library.
+    This function makes use of the fim and mlxtend libraries.
 
     Proof of concept of producing frequent itemsets results using a function
     that can run on a serverless function service such as Google Cloud Functions.
@@ -190,32 +572,47 @@ def main(
             'support', 'confidence', 'lift', 'leverage', or 'conviction'
         assoc_rule_min_threshold : float
             Minimal threshold for the evaluation metric
+        freq_itemsets_algorithm : string
+            'fpgrowth' (fim library) or 'eclat' (item bitmaps)
+        one_hot_cache_path : path of a parquet file caching the one-hot encoded baskets, or None
+            If the file exists it is read instead of the input files, otherwise it is saved
+            after the input files are read. Delete it when the input files change.
     '''
 
-    print(f'Reading {data_path}...')
-    data = read_data_file(data_path)
-    print(f'Reading {symptoms_path}...')
-    symptoms = read_symptoms_file(symptoms_path)
-    print(f'Reading {vax_path}...')
-    vax = read_vax_file(vax_path)
-    print(f'Merging data...')
-    merged_data = merge_dataframes([data, symptoms, vax])
-
-    print(f'Creating baskets...')
-    baskets = merged_data.apply(build_basket, axis=1)
-    print(f'One-hot encoding baskets...')
-    one_hot_baskets_df = build_one_hot_basket_dataset(baskets.to_list())
-    print(f'Extracting frequent itemsets with min_support={freq_itemsets_min_support}...')
-    frequent_itemsets = mlxtend.frequent_patterns.fpgrowth(
-        one_hot_baskets_df, min_support=freq_itemsets_min_support, use_colnames=True)
+    if one_hot_cache_path is not None and fsspec.core.url_to_fs(one_hot_cache_path)[0].exists(one_hot_cache_path):
+        print(f'Reading one-hot encoded baskets from {one_hot_cache_path}...')
+        one_hot_baskets, items = read_one_hot_parquet(one_hot_cache_path)
+    else:
+        print(f'Reading {data_path}...')
+        data = read_data_file(data_path, usecols=DATA_COLS)
+        print(f'Reading {symptoms_path}...')
+        symptoms = read_symptoms_file(symptoms_path, usecols=SYMPTOM_COLS)
+        print(f'Reading {vax_path}...')
+        vax = read_vax_file(vax_path, usecols=VAX_COLS)
+        print(f'Merging data...')
+        merged_data = merge_dataframes([data, symptoms, vax])
+
+        print(f'Creating one-hot encoded baskets...')
+        one_hot_baskets, items = build_one_hot_matrix(merged_data)
+        if one_hot_cache_path is not None:
+            print(f'Saving one-hot encoded baskets to {one_hot_cache_path}...')
+            write_one_hot_parquet(one_hot_baskets, items, one_hot_cache_path)
+
+    print(f'Extracting frequent itemsets with {freq_itemsets_algorithm}, min_support={freq_itemsets_min_support}...')
+    if freq_itemsets_algorithm == 'fpgrowth':
+        frequent_itemsets = find_frequent_itemsets(one_hot_baskets, items, min_support=freq_itemsets_min_support)
+    elif freq_itemsets_algorithm == 'eclat':
+        frequent_itemsets = eclat_frequent_itemsets(one_hot_baskets, items, min_support=freq_itemsets_min_support)
+    else:
+        raise ValueError(f'Unknown frequent itemsets algorithm \'{freq_itemsets_algorithm}\'')
     print(f'Generating association rules with metric=\'{assoc_rule_metric}\', min_threshold={assoc_rule_min_threshold}...')
     assoc_rules = mlxtend.frequent_patterns.association_rules(
         frequent_itemsets, metric=assoc_rule_metric, min_threshold=assoc_rule_min_threshold)
 
     print(f'Saving frequent itemsets to {freq_itemsets_output_path}...')
-    frequent_itemsets.to_csv(freq_itemsets_output_path)    
+    write_csv(frequent_itemsets, freq_itemsets_output_path)
     print(f'Saving association rules to {assoc_rules_output_path}...')
-    assoc_rules.to_csv(assoc_rules_output_path)
+    write_csv(assoc_rules, assoc_rules_output_path)
 
 if __name__ == '__main__':
     main('../data/2021VAERSDATA.csv', '../data/2021VAERSSYMPTOMS.csv', '../data/2021VAERSVAX.csv', \
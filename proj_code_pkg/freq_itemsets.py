@@ -1,21 +1,46 @@
+import collections
+import itertools
+import json
+import fsspec
 import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import scipy.sparse
+import numba
+import fim
 import mlxtend.frequent_patterns
 import mlxtend.preprocessing
 
 
-def append_if_not_na(list: list, obj: object):
-    '''Append "obj" to "list" if "obj" is not NA'''
-    if not pd.isna(obj):
-        list.append(obj)
+LABELED_ITEM_COLS = {
+    'DIED': 'Died',
+    'L_THREAT': 'Life-threatening illness',
+    'ER_VISIT': 'Emergency room visit',
+    'HOSPITAL': 'Hospitalized ',
+    'X_STAY': 'Prolongation of existing hospitalization',
+    'DISABLE': 'Disability',
+    'RECOVD': 'Recovered',
+    'BIRTH_DEFECT': 'Birth defect'
+}
+
+VALUE_ITEM_COLS = ['STATE', 'VAX_NAME', 'SYMPTOM1', 'SYMPTOM2', 'SYMPTOM3', 'SYMPTOM4', 'SYMPTOM5']
+
+# Boundaries between the age groups of convert_to_age_group, and the group labels.
+_AGE_BINS = np.array([3.0, 6.0, 14.0, 19.0, 34.0, 49.0, 65.0, 79.0])
+_AGE_LABELS = np.array(['Age 0-2', 'Age 3-5', 'Age 6-13', 'Age 14-18', 'Age 19-33',
+                        'Age 34-48', 'Age 49-64', 'Age 65-78', 'Age 79-older'], dtype=object)
 
 
 def convert_to_age_group(age: float) -> str:
     '''Convert an age into an age group.
 
-    The age groups are defined by https://www.ncbi.nlm.nih.gov/pmc/articles/PMC3825015/.'''
+    The age groups are defined by https://www.ncbi.nlm.nih.gov/pmc/articles/PMC3825015/.
+    An unknown (NA) age has no age group.'''
 
-    if age < 3.0:
+    if age != age:
+        return pd.NA
+    elif age < 3.0:
         return 'Age 0-2'
     elif age < 6.0:
         return 'Age 3-5'
@@ -49,7 +74,7 @@ def convert_to_sex_group(sex: str) -> str:
 def convert_to_labeled_item(data: str, label: str) -> str:
     '''Convert a VERES boolean data value to the given label if the value is "Y".'''
     
-    return label if not pd.isna(data) and data == 'Y' else pd.NA
+    return label if data is not pd.NA and data == 'Y' else pd.NA
 
 
 def build_basket(data_row: pd.Series) -> list:
@@ -69,27 +94,47 @@ def build_basket(data_row: pd.Series) -> list:
         values representing the data fields of interest
     '''
     
-    basket = list()
-
-    append_if_not_na(basket, data_row['STATE'])
-    append_if_not_na(basket, convert_to_age_group(data_row['AGE_YRS']))
-    append_if_not_na(basket, convert_to_sex_group(data_row['SEX']))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['DIED'], 'Died'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['L_THREAT'], 'Life-threatening illness'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['ER_VISIT'], 'Emergency room visit'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['HOSPITAL'], 'Hospitalized '))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['X_STAY'], 'Prolongation of existing hospitalization'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['DISABLE'], 'Disability'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['RECOVD'], 'Recovered'))
-    append_if_not_na(basket, convert_to_labeled_item(data_row['BIRTH_DEFECT'], 'Birth defect'))
-    append_if_not_na(basket, data_row['VAX_NAME'])
-    append_if_not_na(basket, data_row['SYMPTOM1'])
-    append_if_not_na(basket, data_row['SYMPTOM2'])
-    append_if_not_na(basket, data_row['SYMPTOM3'])
-    append_if_not_na(basket, data_row['SYMPTOM4'])
-    append_if_not_na(basket, data_row['SYMPTOM5'])
-
-    return basket
+    candidates = (
+        data_row['STATE'],
+        convert_to_age_group(data_row['AGE_YRS']),
+        convert_to_sex_group(data_row['SEX']),
+        convert_to_labeled_item(data_row['DIED'], 'Died'),
+        convert_to_labeled_item(data_row['L_THREAT'], 'Life-threatening illness'),
+        convert_to_labeled_item(data_row['ER_VISIT'], 'Emergency room visit'),
+        convert_to_labeled_item(data_row['HOSPITAL'], 'Hospitalized '),
+        convert_to_labeled_item(data_row['X_STAY'], 'Prolongation of existing hospitalization'),
+        convert_to_labeled_item(data_row['DISABLE'], 'Disability'),
+        convert_to_labeled_item(data_row['RECOVD'], 'Recovered'),
+        convert_to_labeled_item(data_row['BIRTH_DEFECT'], 'Birth defect'),
+        data_row['VAX_NAME'],
+        data_row['SYMPTOM1'],
+        data_row['SYMPTOM2'],
+        data_row['SYMPTOM3'],
+        data_row['SYMPTOM4'],
+        data_row['SYMPTOM5'])
+
+    # Same as "not pd.isna(x)" for the values here (str, None, NaN or pd.NA), without its dispatch overhead.
+    return [x for x in candidates if x is not None and x is not pd.NA and x == x]
+
+
+def build_baskets(merged_data: pd.DataFrame) -> list:
+    '''Build the list of baskets of merged VAERS data, one basket per row.
+    The baskets have the same items as build_basket, but are built from whole columns at a time.
+
+    Each field is first converted, in one vectorized pass, to an array of the item of each row
+    (None where the row has no item for the field); the baskets then just collect the items of each row.'''
+
+    age = merged_data['AGE_YRS'].to_numpy(dtype=float)
+    sex = merged_data['SEX']
+    fields = [
+        np.where(np.isnan(age), None, _AGE_LABELS[np.searchsorted(_AGE_BINS, age, side='right')]),
+        np.where((sex == 'F').to_numpy(), 'Female', np.where((sex == 'M').to_numpy(), 'Male', 'Unknown Sex')).tolist()
+    ]
+    fields += [np.where((merged_data[col] == 'Y').to_numpy(), label, None) for col, label in LABELED_ITEM_COLS.items()]
+    fields += [np.where(merged_data[col].notna().to_numpy(), merged_data[col].to_numpy(dtype=object), None)
+               for col in VALUE_ITEM_COLS]
+
+    return [[item for item in row if item is not None] for row in zip(*fields)]
 
 
 def build_one_hot_basket_dataset(baskets: list) -> pd.DataFrame:
@@ -99,3 +144,294 @@ def build_one_hot_basket_dataset(baskets: list) -> pd.DataFrame:
     te_ary = te.fit_transform(baskets, sparse=True)
     df = pd.DataFrame.sparse.from_spmatrix(te_ary, columns=te.columns_)
     return df
+
+
+@numba.njit(parallel=True, cache=True)
+def _build_csr(codes):
+    '''Build the CSR index arrays of a one-hot matrix from the item codes of each row (-1 for no item).
+    Each row of the result lists its distinct items in ascending order.'''
+    n_rows, n_fields = codes.shape
+
+    counts = np.zeros(n_rows, dtype=np.int64)
+    for i in numba.prange(n_rows):
+        count = 0
+        for f in range(n_fields):
+            code = codes[i, f]
+            if code < 0:
+                continue
+            repeated = False
+            for g in range(f):
+                if codes[i, g] == code:
+                    repeated = True
+            if not repeated:
+                count += 1
+        counts[i] = count
+
+    indptr = np.zeros(n_rows + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum(counts)
+    indices = np.empty(indptr[-1], dtype=np.int32)
+    for i in numba.prange(n_rows):
+        start = indptr[i]
+        end = start
+        for f in range(n_fields):
+            code = codes[i, f]
+            if code < 0:
+                continue
+            # Insertion sort into the row's indices written so far, skipping repeated items.
+            j = end
+            while j > start and indices[j - 1] > code:
+                j -= 1
+            if j > start and indices[j - 1] == code:
+                continue
+            for k in range(end, j, -1):
+                indices[k] = indices[k - 1]
+            indices[j] = code
+            end += 1
+
+    return indptr, indices
+
+
+def build_one_hot_matrix(merged_data: pd.DataFrame) -> tuple:
+    '''
+    Build the one-hot basket matrix directly from merged VAERS data.
+    Produces the same items as build_basket followed by build_one_hot_basket_dataset,
+    but works on whole columns at a time instead of one row at a time.
+
+    Parameters
+    ----------
+    merged_data : Pandas DataFrame
+        merged VAERS data
+
+    Returns
+    -------
+    SciPy CSR matrix
+        boolean one-hot matrix with one row per row of "merged_data" and one column per item
+    NumPy array
+        the item of each column, in sorted order
+    '''
+
+    n_rows = len(merged_data)
+
+    # For each field: the field-local code of the item in each row (-1 where the row has no item for the field),
+    # and the labels of the field-local codes.
+    fields = []
+
+    age = merged_data['AGE_YRS'].to_numpy(dtype=float)
+    fields.append((np.where(np.isnan(age), -1, np.searchsorted(_AGE_BINS, age, side='right')), _AGE_LABELS))
+
+    # The comparisons and factorize work on the category codes of categorical columns.
+    sex = merged_data['SEX']
+    fields.append((np.where((sex == 'F').to_numpy(), 0, np.where((sex == 'M').to_numpy(), 1, 2)),
+                   ['Female', 'Male', 'Unknown Sex']))
+
+    for col, label in LABELED_ITEM_COLS.items():
+        fields.append((np.where((merged_data[col] == 'Y').to_numpy(), 0, -1), [label]))
+
+    for col in VALUE_ITEM_COLS:
+        fields.append(pd.factorize(merged_data[col]))
+
+    # Map the field-local codes into one global item id space. The fields share labels (e.g. the symptom
+    # columns), so the labels are factorized again to merge them into a single column per item.
+    offsets = np.cumsum([0] + [len(labels) for _, labels in fields[:-1]])
+    all_labels = np.concatenate([np.asarray(labels, dtype=object) for _, labels in fields])
+    global_codes, items = pd.factorize(all_labels, sort=True)
+
+    # The age, sex and labeled fields list all their labels, including those no row has; like
+    # TransactionEncoder, only the items that occur get a column.
+    occurs = np.zeros(len(items), dtype=bool)
+    for (field_codes, labels), offset in zip(fields, offsets):
+        field_counts = np.bincount(field_codes[field_codes >= 0], minlength=len(labels))
+        occurs[global_codes[offset:offset + len(labels)][field_counts > 0]] = True
+    global_codes = (np.cumsum(occurs) - 1)[global_codes]
+    items = items[occurs]
+
+    codes = np.empty((n_rows, len(fields)), dtype=np.int32)
+    for f, ((field_codes, _), offset) in enumerate(zip(fields, offsets)):
+        codes[:, f] = np.where(field_codes >= 0, global_codes[field_codes + offset], -1)
+    indptr, indices = _build_csr(codes)
+
+    one_hot = scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, indptr),
+        shape=(n_rows, len(items)))
+    return one_hot, items
+
+
+def build_one_hot_sparse(merged_data: pd.DataFrame) -> pd.DataFrame:
+    '''Build the sparse one-hot basket dataframe that the mlxtend frequent itemsets functions expect,
+    directly from merged VAERS data. See build_one_hot_matrix.'''
+
+    one_hot, items = build_one_hot_matrix(merged_data)
+    return pd.DataFrame.sparse.from_spmatrix(one_hot, columns=items)
+
+
+def write_one_hot_parquet(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, path: str):
+    '''Save a one-hot basket matrix and its items, as built by build_one_hot_matrix, to a parquet file.
+
+    Each row of the file holds the item ids of one basket; the items are kept in the file metadata.'''
+    # 64-bit offsets, so that more than 2**31 item ids in total do not overflow.
+    baskets = pa.LargeListArray.from_arrays(pa.array(one_hot.indptr.astype(np.int64, copy=False)), pa.array(one_hot.indices))
+    table = pa.table({'item_ids': baskets}).replace_schema_metadata({'items': json.dumps(list(items))})
+    with fsspec.open(path, 'wb') as file:
+        pq.write_table(table, file, compression='zstd')
+
+
+def read_one_hot_parquet(path: str) -> tuple:
+    '''Read a one-hot basket matrix and its items from a parquet file saved by write_one_hot_parquet.'''
+    with fsspec.open(path, 'rb') as file:
+        table = pq.read_table(file)
+    items = np.array(json.loads(table.schema.metadata[b'items']), dtype=object)
+    baskets = table.column('item_ids').combine_chunks()
+    indices = baskets.flatten().to_numpy()
+    indptr = baskets.offsets.to_numpy() - baskets.offsets[0].as_py()
+    one_hot = scipy.sparse.csr_matrix(
+        (np.ones(len(indices), dtype=bool), indices, indptr),
+        shape=(len(baskets), len(items)))
+    return one_hot, items
+
+
+def find_frequent_itemsets(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, min_support: float) -> pd.DataFrame:
+    '''
+    Find frequent itemsets in a one-hot basket matrix with the FP-growth implementation
+    of the fim library, which is much faster than the pure Python one of mlxtend.
+
+    Parameters
+    ----------
+    one_hot : SciPy CSR matrix
+        boolean one-hot basket matrix, as built by build_one_hot_matrix
+    items : NumPy array
+        the item of each column of "one_hot"
+    min_support : float
+        A float between 0 and 1 for minumum support of the itemsets returned.
+
+    Returns
+    -------
+    Pandas DataFrame
+        frequent itemsets with the "support" and "itemsets" columns of mlxtend.frequent_patterns.fpgrowth,
+        usable with mlxtend.frequent_patterns.association_rules
+    '''
+
+    if min_support <= 0.:
+        raise ValueError('`min_support` must be a positive number within the interval `(0, 1]`. Got %s.' % min_support)
+
+    n_rows = one_hot.shape[0]
+    if n_rows == 0:
+        return pd.DataFrame({'support': [], 'itemsets': []})
+    item_ids = one_hot.indices.tolist()
+    # Identical baskets are common, so they are passed once each with their number of occurrences.
+    transactions = collections.Counter(
+        tuple(item_ids[start:end]) for start, end in zip(one_hot.indptr[:-1].tolist(), one_hot.indptr[1:].tolist()))
+
+    # A negative support is an absolute count for fim; this keeps the same itemsets as mlxtend's support >= min_support.
+    results = fim.fpgrowth(transactions, target='s', supp=-int(np.ceil(min_support * n_rows)), zmin=1, report='a')
+    # fim leaves out the itemsets made only of items that every basket has (it does report them together
+    # with other items), so those are added here.
+    full_item_ids = np.flatnonzero(np.bincount(one_hot.indices, minlength=one_hot.shape[1]) == n_rows).tolist()
+    results += [(itemset, n_rows) for size in range(1, len(full_item_ids) + 1)
+                for itemset in itertools.combinations(full_item_ids, size)]
+
+    return pd.DataFrame({
+        'support': [count / n_rows for _, count in results],
+        'itemsets': [frozenset(items[i] for i in itemset) for itemset, _ in results]
+    })
+
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0f0f0f0f0f0f0f0f)
+_H01 = np.uint64(0x0101010101010101)
+
+
+@numba.njit(cache=True)
+def _popcount(x):
+    '''Count the set bits of a 64-bit word.'''
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+@numba.njit(cache=True)
+def _build_bitmaps(rows, cols, n_items, n_words):
+    '''Build one bitmap per item, where bit j is set if row j contains the item.'''
+    bitmaps = np.zeros((n_items, n_words), dtype=np.uint64)
+    for k in range(len(rows)):
+        bitmaps[cols[k], rows[k] >> 6] |= np.uint64(1) << np.uint64(rows[k] & 63)
+    return bitmaps
+
+
+@numba.njit(cache=True)
+def _count_intersections(prefix, bitmaps):
+    '''Count the set bits of the AND of the "prefix" bitmap with each of "bitmaps", without storing the ANDs.'''
+    counts = np.zeros(bitmaps.shape[0], dtype=np.int64)
+    for i in range(bitmaps.shape[0]):
+        count = 0
+        for w in range(bitmaps.shape[1]):
+            count += _popcount(prefix[w] & bitmaps[i, w])
+        counts[i] = count
+    return counts
+
+
+def _eclat(prefix: tuple, bitmaps: np.ndarray, counts: np.ndarray, item_ids: np.ndarray, min_count: int, results: list):
+    '''Depth-first ECLAT: extend "prefix" with each item of "item_ids", whose bitmaps and counts include "prefix".'''
+    for i in range(len(item_ids)):
+        itemset = prefix + (item_ids[i],)
+        results.append((itemset, counts[i]))
+        if i + 1 < len(item_ids):
+            # Counting only reads the bitmaps; the ANDs are then stored for the frequent extensions alone.
+            ext_counts = _count_intersections(bitmaps[i], bitmaps[i + 1:])
+            frequent = np.flatnonzero(ext_counts >= min_count)
+            if len(frequent) > 0:
+                ext_bitmaps = bitmaps[i + 1:][frequent]
+                np.bitwise_and(ext_bitmaps, bitmaps[i], out=ext_bitmaps)
+                _eclat(itemset, ext_bitmaps, ext_counts[frequent], item_ids[i + 1:][frequent], min_count, results)
+
+
+def eclat_frequent_itemsets(one_hot: scipy.sparse.csr_matrix, items: np.ndarray, min_support: float) -> pd.DataFrame:
+    '''
+    Find frequent itemsets in a one-hot basket matrix with ECLAT over item bitmaps.
+    The support of an itemset is the number of set bits of the AND of its item bitmaps,
+    which is fast to compute when there are a few hundred frequent items.
+
+    Parameters
+    ----------
+    one_hot : SciPy CSR matrix
+        boolean one-hot basket matrix, as built by build_one_hot_matrix
+    items : NumPy array
+        the item of each column of "one_hot"
+    min_support : float
+        A float between 0 and 1 for minumum support of the itemsets returned.
+
+    Returns
+    -------
+    Pandas DataFrame
+        frequent itemsets with the "support" and "itemsets" columns of mlxtend.frequent_patterns.fpgrowth,
+        usable with mlxtend.frequent_patterns.association_rules
+    '''
+
+    if min_support <= 0.:
+        raise ValueError('`min_support` must be a positive number within the interval `(0, 1]`. Got %s.' % min_support)
+
+    n_rows = one_hot.shape[0]
+    if n_rows == 0:
+        return pd.DataFrame({'support': [], 'itemsets': []})
+    one_hot = one_hot.tocoo()
+    min_count = int(np.ceil(min_support * n_rows))
+
+    # Only frequent items can be in frequent itemsets. Least frequent items first keeps the intersections small.
+    item_counts = np.bincount(one_hot.col, minlength=one_hot.shape[1])
+    item_ids = np.flatnonzero(item_counts >= min_count)
+    item_ids = item_ids[np.argsort(item_counts[item_ids], kind='stable')]
+    bitmap_index = np.full(one_hot.shape[1], -1, dtype=np.int64)
+    bitmap_index[item_ids] = np.arange(len(item_ids))
+
+    keep = bitmap_index[one_hot.col] >= 0
+    bitmaps = _build_bitmaps(
+        one_hot.row[keep].astype(np.int64), bitmap_index[one_hot.col[keep]], len(item_ids), (n_rows + 63) // 64)
+
+    results = []
+    _eclat((), bitmaps, item_counts[item_ids], item_ids, min_count, results)
+
+    return pd.DataFrame({
+        'support': [count / n_rows for _, count in results],
+        'itemsets': [frozenset(items[i] for i in itemset) for itemset, _ in results]
+    })
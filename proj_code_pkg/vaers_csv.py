@@ -1,59 +1,125 @@
 import functools
+import fsspec
+import fsspec.implementations.local
+import numpy as np
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv
+import pyarrow.dataset
+import pyarrow.fs
 
 
-def read_vaers_csv(filename, dtype=None, parse_dates=False):
-    '''Read a VAERS CSV file into a dataframe with "VAERS_ID" as index.'''
-    return pd.read_csv(filename, encoding='iso-8859-1', dtype=dtype, parse_dates=parse_dates).set_index('VAERS_ID')
+DATA_COLS = ['STATE', 'AGE_YRS', 'SEX', 'DIED', 'L_THREAT', 'ER_VISIT', 'HOSPITAL', 'X_STAY', 'DISABLE', 'RECOVD',
+             'BIRTH_DEFECT']
+SYMPTOM_COLS = ['SYMPTOM1', 'SYMPTOM2', 'SYMPTOM3', 'SYMPTOM4', 'SYMPTOM5']
+VAX_COLS = ['VAX_NAME']
 
+# pyarrow type of the 'category' dtype of read_vaers_csv; such columns are dictionary encoded as they are parsed.
+_CATEGORY_TYPE = pa.dictionary(pa.int32(), pa.string())
+_CSV_BATCH_SIZE = 100_000
 
-def read_data_file(filename):
+
+def _arrow_type(col, dtype):
+    '''Convert a read_vaers_csv "dtype" value to the pyarrow type its column is parsed as.'''
+    if isinstance(dtype, str) and dtype == 'category':
+        return _CATEGORY_TYPE
+    if dtype in (object, str, 'object', 'str'):
+        return pa.string()
+    try:
+        return pa.from_numpy_dtype(np.dtype(dtype))
+    except (TypeError, pa.ArrowNotImplementedError):
+        raise ValueError(f'Unsupported dtype {dtype!r} for column \'{col}\'') from None
+
+
+def read_vaers_csv(filename, dtype=None, usecols=None):
+    '''Read a VAERS CSV file into a dataframe with "VAERS_ID" as index.
+
+    If "usecols" is given, only those columns (plus "VAERS_ID") are read. "dtype" maps column names
+    to 'category' or a NumPy dtype such as float or object; other columns are read as strings, since
+    pyarrow.dataset would otherwise infer their types from the first block of the file alone.
+    The file is scanned in batches with pyarrow.dataset, keeping only the wanted columns, with the
+    'category' ones dictionary encoded as they are parsed. The batches are collected into one table,
+    which is then converted to the dataframe.'''
+    fs, path = fsspec.core.url_to_fs(filename)
+    # Read local files through pyarrow's own filesystem; a parse error while reading through the fsspec
+    # wrapper can otherwise abort the interpreter at exit.
+    if isinstance(fs, fsspec.implementations.local.LocalFileSystem):
+        filesystem = pyarrow.fs.LocalFileSystem()
+    else:
+        filesystem = pyarrow.fs.PyFileSystem(pyarrow.fs.FSSpecHandler(fs))
+    read_options = pyarrow.csv.ReadOptions(encoding='iso-8859-1')
+    if usecols is None:
+        columns = pyarrow.dataset.dataset(
+            path, format=pyarrow.dataset.CsvFileFormat(read_options=read_options), filesystem=filesystem).schema.names
+    else:
+        columns = ['VAERS_ID', *usecols]
+    column_types = {col: pa.string() for col in columns}
+    column_types['VAERS_ID'] = pa.int64()
+    column_types.update({col: _arrow_type(col, t) for col, t in (dtype or {}).items() if col in column_types})
+
+    dataset = pyarrow.dataset.dataset(
+        path,
+        format=pyarrow.dataset.CsvFileFormat(
+            read_options=read_options,
+            convert_options=pyarrow.csv.ConvertOptions(column_types=column_types, strings_can_be_null=True)),
+        filesystem=filesystem)
+    table = dataset.to_table(columns=columns, batch_size=_CSV_BATCH_SIZE).unify_dictionaries()
+    return table.to_pandas().set_index('VAERS_ID')
+
+
+def read_data_file(filename, usecols=None):
     '''Read a VAERSDATA file into a dataframe with "VAERS_ID" as index.'''
     return read_vaers_csv(
         filename,
+        usecols=usecols,
         dtype={
-            'STATE': str,
+            'STATE': 'category',
             'AGE_YRS': float,
             'CAGE_YR': float,
             'CAGE_MO': float,
-            'SEX': str,
-            'SYMPTOM_TEXT': str,
-            'DIED': str,
-            'L_THREAT': str,
-            'ER_VISIT': str,
-            'HOSPITAL': str,
+            'SEX': 'category',
+            'SYMPTOM_TEXT': object,
+            'DIED': 'category',
+            'L_THREAT': 'category',
+            'ER_VISIT': 'category',
+            'HOSPITAL': 'category',
             'HOSPDAYS': float,
-            'X_STAY': str,
-            'DISABLE': str,
-            'RECOVD': str,
+            'X_STAY': 'category',
+            'DISABLE': 'category',
+            'RECOVD': 'category',
             'NUMDAYS': float,
-            'LAB_DATA': str,
-            'V_ADMINBY': str,
-            'V_FUNDBY': str,
-            'OTHER_MEDS': str,
-            'CUR_ILL': str,
-            'HISTORY': str,
-            'PRIOR_VAX': str,
-            'SPLTTYPE': str,
+            'LAB_DATA': object,
+            'V_ADMINBY': object,
+            'V_FUNDBY': object,
+            'OTHER_MEDS': object,
+            'CUR_ILL': object,
+            'HISTORY': object,
+            'PRIOR_VAX': object,
+            'SPLTTYPE': object,
             'FORM_VERS': float,
-            'BIRTH_DEFECT': str,
-            'OFC_VISIT': str,
-            'ER_ED_VISIT': str,
-            'ALLERGIES': str
-        },
-        parse_dates=['RECVDATE', 'RPT_DATE', 'DATEDIED', 'VAX_DATE', 'ONSET_DATE', 'TODAYS_DATE'])
+            'BIRTH_DEFECT': 'category',
+            'OFC_VISIT': object,
+            'ER_ED_VISIT': object,
+            'ALLERGIES': object
+        })
 
 
-def read_symptoms_file(filename):
+def read_symptoms_file(filename, usecols=None):
     '''Read a VAERSSYMPTOMS file into a dataframe with "VAERS_ID" as index.'''
-    return read_vaers_csv(filename)
+    return read_vaers_csv(filename, usecols=usecols, dtype={col: 'category' for col in SYMPTOM_COLS})
 
 
-def read_vax_file(filename):
+def read_vax_file(filename, usecols=None):
     '''Read a VAERSVAX file into a dataframe with "VAERS_ID" as index.'''
-    return read_vaers_csv(filename)
+    return read_vaers_csv(filename, usecols=usecols, dtype={col: 'category' for col in VAX_COLS})
 
 
 def merge_dataframes(dataframes: list) -> pd.DataFrame:
-    '''Merge VAERS dataframes on the index ("VAERS_ID")'''
-    return functools.reduce(lambda x, y: pd.merge(x, y, left_index=True, right_index=True, sort=False), dataframes)
+    '''Merge VAERS dataframes on the index ("VAERS_ID")
+
+    Dataframes with unique indexes are aligned in a single concat. VAERSSYMPTOMS and VAERSVAX
+    can have several rows per "VAERS_ID", which concat cannot align, so those are merged pairwise.'''
+    if all(df.index.is_unique for df in dataframes):
+        return pd.concat(dataframes, axis=1, join='inner', copy=False)
+    # Index merges; merging on a "VAERS_ID" column is slower for these tables.
+    return functools.reduce(lambda x, y: pd.merge(x, y, left_index=True, right_index=True, sort=False, copy=False), dataframes)